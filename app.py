@@ -3,7 +3,8 @@
 # Importing required libraries and modules
 from bson import ObjectId
 from flask import Flask, jsonify, request, send_file
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 from fpdf import FPDF
 import smtplib
 from email.mime.text import MIMEText
@@ -14,10 +15,16 @@ import logging
 from dotenv import load_dotenv
 from flask_cors import CORS
 import os
+import atexit
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use("Agg")  
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 # Load environment variables from .env file
 load_dotenv()
@@ -36,6 +43,7 @@ CORS(app, resources={
     r"/delete/*": {"origins": "http://localhost:3039"},
     r"/get/*": {"origins": "http://localhost:3039"},
     r"/update/*": {"origins": "http://localhost:3039"},
+    r"/reports/*": {"origins": "http://localhost:3039"},
 })
 
 # MongoDB connection
@@ -46,6 +54,24 @@ metrics_collection = db.system_metrics
 daily_max_collection = db.daily_max_metrics 
 incident_collection = db.incidents
 
+# Buffered ingest for /add: documents are grouped for a few milliseconds (or up to
+# INGEST_MAX_BATCH items) and written with one insert_many and one rollup update
+INGEST_BUFFERED = os.getenv("INGEST_BUFFERED", "false").lower() == "true"
+INGEST_FLUSH_INTERVAL_MS = float(os.getenv("INGEST_FLUSH_INTERVAL_MS", "5"))
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "500"))
+# /add answers 503 once this many documents are waiting to be flushed
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", str(INGEST_MAX_BATCH * 10)))
+# When false, /add answers 202 as soon as the document is buffered
+INGEST_ACK_AFTER_FLUSH = os.getenv("INGEST_ACK_AFTER_FLUSH", "true").lower() == "true"
+
+# Report jobs: PDF rendering runs on REPORT_WORKERS threads, and new jobs get a 429
+# once REPORT_QUEUE_LIMIT are waiting
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_QUEUE_LIMIT = int(os.getenv("REPORT_QUEUE_LIMIT", "8"))
+REPORT_JOB_TTL = int(os.getenv("REPORT_JOB_TTL", "3600"))
+# Seconds the GET export waits for its job before answering 202 with the job instead
+REPORT_WAIT_TIMEOUT = float(os.getenv("REPORT_WAIT_TIMEOUT", "60"))
+
 
 ############################################
 ############### API'S and ENDPOINT#########
@@ -57,9 +83,24 @@ incident_collection = db.incidents
 @app.route("/add", methods=["POST"])
 def add_data():
     data = request.json  
-    if not data:
+    # Both ingest modes need a document with a string date to count its shifts
+    if not data or not isinstance(data, dict) or not isinstance(data.get("date"), str):
         return jsonify({"error": "Invalid data provided"}), 400  
 
+    # Buffered ingest: hand the document to the group-commit buffer
+    if ingest_buffer is not None:
+        write = ingest_buffer.submit(data)
+        if write is None:
+            return jsonify({"error": "Too many pending writes, try again later."}), 503, {"Retry-After": "1"}
+        if not INGEST_ACK_AFTER_FLUSH:
+            return jsonify({"message": "Data accepted for insertion!"}), 202
+        try:
+            write.wait()
+        except Exception as e:
+            logging.error(f"Error flushing ingest buffer: {e}")
+            return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+        return jsonify({"message": "Data inserted successfully!"}), 201
+
     metrics_collection.insert_one(data)  
 
     date = data.get("date")
@@ -245,29 +286,47 @@ def get_daily_table():
 
 @app.route("/export-monthly-pdf-with-charts-separate-pages/<int:year>/<int:month>", methods=["GET"])
 def export_monthly_report_pdf_with_charts_separate_pages(year, month):
-    # Generate daily table data
-    daily_table = generate_daily_table()
-
-    # Filter data for the specified month and year
-    monthly_data = {}
-    for component, entries in daily_table.items():
-        monthly_entries = [
-            entry for entry in entries
-            if datetime.strptime(entry["date"], "%d-%m-%Y").month == month and
-               datetime.strptime(entry["date"], "%d-%m-%Y").year == year
-        ]
-        if monthly_entries:
-            monthly_data[component] = monthly_entries
-
-    if not monthly_data:
-        return jsonify({"error": "No data found for the specified month and year."}), 404
+    # Rendered on the report pool so inline exports share its limits
+    job = submit_monthly_report_job(year, month)
+    if job is None:
+        return jsonify({"error": "Too many reports are being generated, try again later."}), 429, {"Retry-After": "30"}
 
-    # Create the PDF with charts on separate pages
-    file_name = f"monthly_output/monthly_report_with_charts_separate_pages_{month}_{year}.pdf"
-    create_monthly_report_pdf_with_charts_separate_pages(month, year, monthly_data, "./avaxia-logo.png", output_file=file_name)
+    if not job.done.wait(REPORT_WAIT_TIMEOUT):
+        return jsonify(job.to_dict()), 202, {"Location": f"/reports/{job.id}"}
+    if job.status == "failed":
+        return jsonify({"error": job.error}), job.error_code
 
     # Send the PDF file
-    return send_file(file_name, as_attachment=True)
+    return send_file(job.output_file, as_attachment=True, download_name=job.download_name)
+
+# Route to queue the monthly report as a background job
+@app.route("/export-monthly-pdf-with-charts-separate-pages/<int:year>/<int:month>", methods=["POST"])
+def create_monthly_report_job(year, month):
+    job = submit_monthly_report_job(year, month)
+    if job is None:
+        return jsonify({"error": "Too many reports are being generated, try again later."}), 429, {"Retry-After": "30"}
+
+    return jsonify(job.to_dict()), 202, {"Location": f"/reports/{job.id}"}
+
+# Route to get the status of a report job
+@app.route("/reports/<string:job_id>", methods=["GET"])
+def get_report_job(job_id):
+    job = report_pool.get(job_id)
+    if not job:
+        return jsonify({"error": "Report job not found"}), 404
+    return jsonify(job.to_dict())
+
+# Route to download the result of a report job
+@app.route("/reports/<string:job_id>/download", methods=["GET"])
+def download_report_job(job_id):
+    job = report_pool.get(job_id)
+    if not job:
+        return jsonify({"error": "Report job not found"}), 404
+    if job.status == "failed":
+        return jsonify({"error": job.error}), job.error_code
+    if job.status != "done":
+        return jsonify({"error": "Report is not ready yet.", **job.to_dict()}), 409
+    return send_file(job.output_file, as_attachment=True, download_name=job.download_name)
 
 @app.route("/get-all-daily-max", methods=["GET"])
 def get_all_daily_max():
@@ -288,71 +347,37 @@ def get_usage_by_period_and_component():
     # Get query parameters
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
-    component = request.args.get("component")
+    # component may be repeated or comma separated; missing or "all" means every component
+    requested = [name.strip() for value in request.args.getlist("component") for name in value.split(",") if name.strip()]
+    components = None if not requested or "all" in requested else requested
+    stats = [stat.strip() for stat in request.args.get("stats", ",".join(USAGE_STATS)).split(",") if stat.strip()]
+
+    if not (start_date and end_date):
+        return jsonify({"error": "Missing required query parameters: start_date or end_date"}), 400
+
+    invalid_stats = [stat for stat in stats if stat not in USAGE_STATS]
+    if invalid_stats or not stats:
+        return jsonify({"error": f"Invalid stats: {invalid_stats}. Expected any of {list(USAGE_STATS)}"}), 400
 
-    if not (start_date and end_date and component):
-        return jsonify({"error": "Missing required query parameters: start_date, end_date, or component"}), 400
+    # A single component without stats keeps the original per-day list response
+    single_component = components is not None and len(components) == 1 and "stats" not in request.args
+    if single_component:
+        stats = ["daily"]
 
     try:
         # Parse and validate date format
         start_date_obj = datetime.strptime(start_date, "%d-%m-%Y")
         end_date_obj = datetime.strptime(end_date, "%d-%m-%Y")
 
-        # Extract day, month, and year from start and end dates
-        start_day, start_month, start_year = start_date_obj.day, start_date_obj.month, start_date_obj.year
-        end_day, end_month, end_year = end_date_obj.day, end_date_obj.month, end_date_obj.year
-
-        # Query daily_max_collection for the specified period
-        pipeline = [
-            {
-                "$addFields": {  # Extract day, month, and year from the date string
-                    "day": {"$toInt": {"$substr": ["$date", 0, 2]}},
-                    "month": {"$toInt": {"$substr": ["$date", 3, 2]}},
-                    "year": {"$toInt": {"$substr": ["$date", 6, 4]}},
-                }
-            },
-            {
-                "$match": {
-                    "$and": [
-                        {"year": {"$gte": start_year, "$lte": end_year}},
-                        {"month": {"$gte": start_month, "$lte": end_month}},
-                        {"day": {"$gte": start_day, "$lte": end_day}}
-                    ]
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "date": 1,
-                    f"cpu_usage.{component}": 1,
-                    f"memory_usage.{component}": 1
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$date",
-                    "cpu_usage": {"$max": f"$cpu_usage.{component}"},
-                    "memory_usage": {"$max": f"$memory_usage.{component}"}
-                }
-            },
-            {
-                "$sort": {"_id": 1}  # Sort by date
-            }
-        ]
-
-        usage_data = list(daily_max_collection.aggregate(pipeline))
+        # One aggregation answers every component and statistic
+        pipeline = build_usage_pipeline(start_date_obj, end_date_obj, components, stats)
+        facets = next(daily_max_collection.aggregate(pipeline), {})
+        usage = format_usage(facets, stats, components)
 
-        # Format the response
-        response = [
-            {
-                "date": entry["_id"],
-                "cpu_usage": entry["cpu_usage"] if entry["cpu_usage"] is not None else "Not Available",
-                "memory_usage": entry["memory_usage"] if entry["memory_usage"] is not None else "Not Available"
-            }
-            for entry in usage_data
-        ]
+        if single_component:
+            return jsonify(usage[components[0]]["daily"])
 
-        return jsonify(response)
+        return jsonify(usage)
 
     except ValueError as e:
         return jsonify({"error": f"Invalid date format. Expected 'dd-mm-yyyy'. Details: {str(e)}"}), 400
@@ -427,6 +452,15 @@ def calculate_and_store_max_metrics(date):
         logging.error(f"Not enough shifts for {date}. Expected 3, found {len(shifts)}.")
         return
 
+    max_metrics = compute_max_metrics(date, shifts)
+
+    # Update the daily_max_collection
+    daily_max_collection.update_one(
+        {"date": date}, {"$set": max_metrics}, upsert=True
+    )
+    logging.debug(f"Updated max metrics: {max_metrics}")
+# Function to compute the daily maximum of a list of shifts
+def compute_max_metrics(date, shifts):
     max_cpu = {}
     max_memory = {}
     application_availability = {}
@@ -460,191 +494,211 @@ def calculate_and_store_max_metrics(date):
         "memory_usage": max_memory,
         "application_availability": application_availability,
     }
+    return max_metrics
+# Report templates, defined once per process
+# Table columns are (header, width)
+ORGANIZATIONAL_COMPONENTS = ["blc-be", "blc-fe", "gco-be", "gco-fe", "sbp-be", "sbp-fe"]
+ORGANIZATIONAL_TABLE = [("Component", 60), ("CPU Usage (core)", 40), ("Memory Usage", 50), ("Availability (%)", 45)]
+TOOLS_TABLE = [("Component", 65), ("CPU Usage (core)", 40), ("Memory Usage", 50), ("Availability (%)", 40)]
+MONTHLY_TABLE = [("Date", 40), ("CPU Usage (core)", 40), ("Memory Usage (MiB)", 50), ("Availability (%)", 50)]
+
+# Page layouts: logo position, space below it, first page title and page border
+DAILY_LAYOUT = {"logo_y": -12, "header_space": 20, "title": None, "border": False}
+MONTHLY_LAYOUT = {"logo_y": -8, "header_space": 30, "title": "Monthly Report", "border": True}
+
+# PDF document used by every report
+class ReportPDF(FPDF):
+    def __init__(self, renderer, layout):
+        super().__init__()
+        self.renderer = renderer
+        self.layout = layout
+
+    def header(self):
+        self.renderer.place_logo(self, self.layout["logo_y"])
+        self.ln(self.layout["header_space"])
+        if self.layout["title"] and self.page_no() == 1:  # Add header only on the first page
+            self.set_font("Arial", "B", 20)
+            self.cell(0, 10, self.layout["title"], 0, 1, "C")
+            self.ln(5)
+
+    def footer(self):
+        if self.layout["border"]:
+            self.rect(5, 5, 200, 287)
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "C")
+
+    def table_row(self, columns, values):
+        last = len(columns) - 1
+        for index, ((_, width), value) in enumerate(zip(columns, values)):
+            self.cell(width, 10, value, 1, 1 if index == last else 0, "C")
+
+    def table_header(self, columns):
+        self.table_row(columns, [title for title, _ in columns])
+
+# Renders every report through the same engine; the logo is decoded once per process
+class ReportRenderer:
+    def __init__(self, logo_path):
+        self.logo_path = logo_path
+        # Private fpdf 1.7.2 parsers, the same ones image() uses
+        parser = FPDF()
+        extension = logo_path.rsplit(".", 1)[-1].lower()
+        if extension in ("jpg", "jpeg"):
+            self.logo_info = parser._parsejpg(logo_path)
+        elif extension == "png":
+            self.logo_info = parser._parsepng(logo_path)
+        else:
+            self.logo_info = parser._parsegif(logo_path)
+
+    def place_logo(self, pdf, y):
+        # Relies on the image table of fpdf 1.7.2 (pinned in requirements.txt): pdf.images maps
+        # the file name to the parsed info with its "i" index, and image() reuses an existing entry.
+        # FPDF drops the image data once written, so each document gets its own copy
+        if self.logo_path not in pdf.images:
+            pdf.images[self.logo_path] = dict(self.logo_info, i=len(pdf.images) + 1)
+        pdf.image(self.logo_path, x=10, y=y, w=190)
+
+    def render_daily_max(self, date, max_data, output_file):
+        pdf = ReportPDF(self, DAILY_LAYOUT)
+        pdf.add_page()
 
-    # Update the daily_max_collection
-    daily_max_collection.update_one(
-        {"date": date}, {"$set": max_metrics}, upsert=True
-    )
-    logging.debug(f"Updated max metrics: {max_metrics}")
-# Function to create daily/shift PDF report
-def create_daily_max_pdf(date, max_data, header_image_path, output_file="daily_max_report.pdf"):
-    class PDF(FPDF):
-        def header(self):
-            self.image(header_image_path, x=10, y=-12, w=190)
-            self.ln(20)
-
-        def footer(self):
-            self.set_y(-15)
-            self.set_font("Arial", "I", 8)
-            self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "C")
-
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, f"Date: {date}", ln=True, align="C")
-    pdf.ln(10)
-
-    # Organizational Applications Section
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "Organizational Applications: PTO", ln=True)
-    pdf.ln(5)
-    pdf.set_font("Arial", size=12)
-
-    pdf.cell(60, 10, "Component", 1, 0, "C")
-    pdf.cell(40, 10, "CPU Usage (core)", 1, 0, "C")
-    pdf.cell(50, 10, "Memory Usage", 1, 0, "C")
-    pdf.cell(45, 10, "Availability (%)", 1, 1, "C")
-
-    # List of organizational components, including sbp-fe
-    organizational_components = ["blc-be", "blc-fe", "gco-be", "gco-fe", "sbp-be", "sbp-fe"]
-    for component in organizational_components:
-        cpu = max_data["cpu_usage"].get(component, "Not Available")
-        memory = max_data["memory_usage"].get(component, "Not Available")
-        availability = "100%" if component != "sbp-be" and cpu != "Down" else "Down"
-        
-        # Remove "MiB" if the memory value is "Down" or non-numeric
-        memory_display = f"{memory} MiB" if isinstance(memory, (int, float)) else memory
-
-        pdf.cell(60, 10, component, 1, 0, "C")
-        pdf.cell(40, 10, str(cpu), 1, 0, "C")
-        pdf.cell(50, 10, memory_display, 1, 0, "C")
-        pdf.cell(45, 10, availability, 1, 1, "C")
-
-    pdf.ln(10)
-
-    # Tools Section
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "Tools:", ln=True)
-    pdf.ln(5)
-    pdf.set_font("Arial", size=12)
-
-    pdf.cell(65, 10, "Component", 1, 0, "C")
-    pdf.cell(40, 10, "CPU Usage (core)", 1, 0, "C")
-    pdf.cell(50, 10, "Memory Usage", 1, 0, "C")
-    pdf.cell(40, 10, "Availability (%)", 1, 1, "C")
-
-    # Add components to Tools section excluding the ones in organizational_components
-    for component in max_data["cpu_usage"]:
-        if component not in organizational_components:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, f"Date: {date}", ln=True, align="C")
+        pdf.ln(10)
+
+        # Organizational Applications Section
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, "Organizational Applications: PTO", ln=True)
+        pdf.ln(5)
+        pdf.set_font("Arial", size=12)
+        pdf.table_header(ORGANIZATIONAL_TABLE)
+
+        for component in ORGANIZATIONAL_COMPONENTS:
             cpu = max_data["cpu_usage"].get(component, "Not Available")
             memory = max_data["memory_usage"].get(component, "Not Available")
-            availability = "100%" if cpu != "Down" else "Down"
+            availability = "100%" if component != "sbp-be" and cpu != "Down" else "Down"
+            pdf.table_row(ORGANIZATIONAL_TABLE, [component, str(cpu), memory_display(memory), availability])
 
-            # Remove "MiB" if the memory value is "Down" or non-numeric
-            memory_display = f"{memory} MiB" if isinstance(memory, (int, float)) else memory
+        pdf.ln(10)
 
-            pdf.cell(65, 10, component, 1, 0, "C")
-            pdf.cell(40, 10, str(cpu), 1, 0, "C")
-            pdf.cell(50, 10, memory_display, 1, 0, "C")
-            pdf.cell(40, 10, availability, 1, 1, "C")
-
-    pdf.output(output_file)  
-    return output_file
-# Function to create monthly report PDF
-def create_monthly_report_pdf_with_charts_separate_pages(month, year, data, header_image_path, output_file="monthly_report.pdf", charts_folder="charts"):
-    class PDF(FPDF):
-        def header(self):
-            self.image(header_image_path, x=10, y=-8, w=190)
-            self.ln(30)
-            if self.page_no() == 1:  # Add header only on the first page
-                self.set_font("Arial", "B", 20)
-                self.cell(0, 10, "Monthly Report", 0, 1, "C")
-                self.ln(5)
-
-        def footer(self):
-            self.rect(5, 5, 200, 287)
-            self.set_y(-15)
-            self.set_font("Arial", "I", 8)
-            self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "C")
-
-    # Ensure the charts folder exists
-    if not os.path.exists(charts_folder):
-        os.makedirs(charts_folder)
-
-    pdf = PDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-
-    # Add the first page with title
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, f"Metrics for {month}-{year}", ln=True, align="C")
-    pdf.ln(20)  # Add more spacing for aesthetics
-
-    # Iterate over components
-    for component, entries in data.items():
-        # Add a new page for the table
-        pdf.add_page()
+        # Tools Section
         pdf.set_font("Arial", "B", 12)
-        pdf.cell(0, 10, f"Component: {component}", ln=True)
-        pdf.set_font("Arial", size=10)
+        pdf.cell(0, 10, "Tools:", ln=True)
+        pdf.ln(5)
+        pdf.set_font("Arial", size=12)
+        pdf.table_header(TOOLS_TABLE)
+
+        # Add components to Tools section excluding the organizational ones
+        for component in max_data["cpu_usage"]:
+            if component not in ORGANIZATIONAL_COMPONENTS:
+                cpu = max_data["cpu_usage"].get(component, "Not Available")
+                memory = max_data["memory_usage"].get(component, "Not Available")
+                availability = "100%" if cpu != "Down" else "Down"
+                pdf.table_row(TOOLS_TABLE, [component, str(cpu), memory_display(memory), availability])
+
+        pdf.output(output_file)
+        return output_file
+
+    def render_monthly(self, month, year, data, output_file, charts_folder, progress=None):
+        # Ensure the charts folder exists
+        if not os.path.exists(charts_folder):
+            os.makedirs(charts_folder)
+
+        pdf = ReportPDF(self, MONTHLY_LAYOUT)
+        pdf.set_auto_page_break(auto=True, margin=15)
+
+        # Add the first page with title
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, f"Metrics for {month}-{year}", ln=True, align="C")
+        pdf.ln(20)  # Add more spacing for aesthetics
 
-        # Table header
-        pdf.cell(40, 10, "Date", 1, 0, "C")
-        pdf.cell(40, 10, "CPU Usage (core)", 1, 0, "C")
-        pdf.cell(50, 10, "Memory Usage (MiB)", 1, 0, "C")
-        pdf.cell(50, 10, "Availability (%)", 1, 1, "C")
+        # Iterate over components
+        for index, (component, entries) in enumerate(data.items()):
+            # Add a new page for the table
+            pdf.add_page()
+            pdf.set_font("Arial", "B", 12)
+            pdf.cell(0, 10, f"Component: {component}", ln=True)
+            pdf.set_font("Arial", size=10)
+            pdf.table_header(MONTHLY_TABLE)
 
-        # Table rows
-        for entry in entries:
-            pdf.cell(40, 10, entry["date"], 1, 0, "C")
-            pdf.cell(40, 10, str(entry["cpu_usage"]), 1, 0, "C")
-            pdf.cell(50, 10, str(entry["memory_usage"]), 1, 0, "C")
-            pdf.cell(50, 10, str(entry["availability"]), 1, 1, "C")
+            for entry in entries:
+                pdf.table_row(MONTHLY_TABLE, [entry["date"], str(entry["cpu_usage"]), str(entry["memory_usage"]), str(entry["availability"])])
 
-        pdf.ln(5)  # Add space after the table
+            pdf.ln(5)  # Add space after the table
 
-        # Generate charts for the component
-        cpu_chart_file, memory_chart_file = generate_component_charts(component, entries, charts_folder)
+            # Generate charts for the component
+            cpu_chart_file, memory_chart_file = generate_component_charts(component, entries, charts_folder)
 
-        # Add a new page for the charts
-        pdf.add_page()
+            # Add a new page for the charts
+            pdf.add_page()
+
+            # Add CPU chart
+            pdf.set_font("Arial", "B", 10)
+            pdf.cell(0, 10, f"CPU Usage Chart for {component}", ln=True, align="C")
+            pdf.image(cpu_chart_file, x=20, y=40, w=170, h=90)
+
+            # Add Memory chart
+            pdf.ln(95)  # Move below the first chart
+            pdf.cell(0, 10, f"Memory Usage Chart for {component}", ln=True, align="C")
+            pdf.image(memory_chart_file, x=20, y=140, w=170, h=90)
 
-        # Add CPU chart
-        pdf.set_font("Arial", "B", 10)
-        pdf.cell(0, 10, f"CPU Usage Chart for {component}", ln=True, align="C")
-        pdf.image(cpu_chart_file, x=20, y=40, w=170, h=90)
+            if progress:
+                progress(index + 1, len(data))
 
-        # Add Memory chart
-        pdf.ln(95)  # Move below the first chart
-        pdf.cell(0, 10, f"Memory Usage Chart for {component}", ln=True, align="C")
-        pdf.image(memory_chart_file, x=20, y=140, w=170, h=90)
+        # Save PDF
+        pdf.output(output_file)
+        return output_file
 
-    # Save PDF
-    pdf.output(output_file)
-    return output_file
-# Function to generate charts for the monthly
+report_renderers = {}
+
+# Function to get the renderer for a logo, created once per process
+def get_report_renderer(header_image_path):
+    if header_image_path not in report_renderers:
+        report_renderers[header_image_path] = ReportRenderer(header_image_path)
+    return report_renderers[header_image_path]
+
+# Remove "MiB" if the memory value is "Down" or non-numeric
+def memory_display(memory):
+    return f"{memory} MiB" if isinstance(memory, (int, float)) else memory
+
+# Function to create daily/shift PDF report
+def create_daily_max_pdf(date, max_data, header_image_path, output_file="daily_max_report.pdf"):
+    return get_report_renderer(header_image_path).render_daily_max(date, max_data, output_file)
+# Function to create monthly report PDF
+def create_monthly_report_pdf_with_charts_separate_pages(month, year, data, header_image_path, output_file="monthly_report.pdf", charts_folder="charts", progress=None):
+    return get_report_renderer(header_image_path).render_monthly(month, year, data, output_file, charts_folder, progress)
+# Function to generate charts for the monthly (Figure objects, since pyplot is not thread-safe)
 def generate_component_charts(component, entries, charts_folder):
     dates = [entry["date"] for entry in entries]
     cpu_usage = [entry["cpu_usage"] if isinstance(entry["cpu_usage"], (int, float)) else 0 for entry in entries]
     memory_usage = [entry["memory_usage"] if isinstance(entry["memory_usage"], (int, float)) else 0 for entry in entries]
 
     # CPU Usage Chart
-    plt.figure(figsize=(10, 5))
-    plt.plot(dates, cpu_usage, marker="o", label="CPU Usage (core)")
-    plt.title(f"CPU Usage for {component}")
-    plt.xlabel("Date")
-    plt.ylabel("CPU Usage (core)")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    figure = Figure(figsize=(10, 5))
+    axes = figure.add_subplot()
+    axes.plot(dates, cpu_usage, marker="o", label="CPU Usage (core)")
+    axes.set_title(f"CPU Usage for {component}")
+    axes.set_xlabel("Date")
+    axes.set_ylabel("CPU Usage (core)")
+    axes.grid(True)
+    axes.tick_params(axis="x", labelrotation=45)
+    figure.tight_layout()
     cpu_chart_file = os.path.join(charts_folder, f"{component}_cpu_chart.png")
-    plt.savefig(cpu_chart_file)
-    plt.close()
+    figure.savefig(cpu_chart_file)
 
     # Memory Usage Chart
-    plt.figure(figsize=(10, 5))
-    plt.plot(dates, memory_usage, marker="o", label="Memory Usage (MiB)", color="orange")
-    plt.title(f"Memory Usage for {component}")
-    plt.xlabel("Date")
-    plt.ylabel("Memory Usage (MiB)")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    figure = Figure(figsize=(10, 5))
+    axes = figure.add_subplot()
+    axes.plot(dates, memory_usage, marker="o", label="Memory Usage (MiB)", color="orange")
+    axes.set_title(f"Memory Usage for {component}")
+    axes.set_xlabel("Date")
+    axes.set_ylabel("Memory Usage (MiB)")
+    axes.grid(True)
+    axes.tick_params(axis="x", labelrotation=45)
+    figure.tight_layout()
     memory_chart_file = os.path.join(charts_folder, f"{component}_memory_chart.png")
-    plt.savefig(memory_chart_file)
-    plt.close()
+    figure.savefig(memory_chart_file)
 
     return cpu_chart_file, memory_chart_file# generate table for component of the dailys
 def generate_daily_table():
@@ -736,6 +790,377 @@ def get_all_monthly():
     except Exception as e:
         logging.error(f"Error fetching monthly data: {e}")
         return None
+# Statistics /usage can compute over a period
+USAGE_STATS = ("max", "min", "avg", "daily")
+USAGE_METRICS = ("cpu_usage", "memory_usage")
+
+# Function to build the /usage aggregation: one $facet per requested statistic
+def build_usage_pipeline(start_date, end_date, components, stats):
+    # Only numeric values count for max/min/avg ("Down" is a string)
+    numeric_value = {"$cond": [{"$isNumber": "$usage.value"}, "$usage.value", None]}
+
+    # Flatten {cpu_usage: {component: value}} into one entry per component and metric
+    usage_entries = {
+        "$concatArrays": [
+            {
+                "$map": {
+                    "input": {"$objectToArray": {"$ifNull": [f"${metric}", {}]}},
+                    "in": {"component": "$$this.k", "metric": metric, "value": "$$this.v"}
+                }
+            }
+            for metric in USAGE_METRICS
+        ]
+    }
+
+    unwind_usage = [{"$unwind": "$usage"}]
+    if components is not None:
+        unwind_usage.append({"$match": {"usage.component": {"$in": components}}})
+
+    facets = {
+        "dates": [
+            {"$group": {"_id": "$date", "parsed_date": {"$first": "$parsed_date"}}},
+            {"$sort": {"parsed_date": 1}}
+        ]
+    }
+    if "max" in stats or "min" in stats or "avg" in stats:
+        facets["summary"] = unwind_usage + [
+            {
+                "$group": {
+                    "_id": {"component": "$usage.component", "metric": "$usage.metric"},
+                    "max": {"$max": numeric_value},
+                    "min": {"$min": numeric_value},
+                    "avg": {"$avg": numeric_value}
+                }
+            }
+        ]
+    if "daily" in stats:
+        facets["daily"] = unwind_usage + [
+            {
+                "$group": {
+                    "_id": {"component": "$usage.component", "metric": "$usage.metric", "date": "$date"},
+                    "value": {"$max": "$usage.value"}
+                }
+            }
+        ]
+
+    return [
+        {
+            "$addFields": {
+                "parsed_date": {"$dateFromString": {"dateString": "$date", "format": "%d-%m-%Y", "onError": None}}
+            }
+        },
+        {"$match": {"parsed_date": {"$gte": start_date, "$lte": end_date}}},
+        {"$project": {"_id": 0, "date": 1, "parsed_date": 1, "usage": usage_entries}},
+        {"$facet": facets}
+    ]
+
+# Function to shape the /usage facets into {component: {stat: ...}}
+def format_usage(facets, stats, components=None):
+    dates = [entry["_id"] for entry in facets.get("dates", [])]
+    # Requested components without rows still get "Not Available" entries
+    usage = {component: {} for component in components or []}
+
+    for entry in facets.get("summary", []):
+        component, metric = entry["_id"]["component"], entry["_id"]["metric"]
+        for stat in ("max", "min", "avg"):
+            if stat in stats:
+                value = entry[stat] if entry[stat] is not None else "Not Available"
+                usage.setdefault(component, {}).setdefault(stat, {})[metric] = value
+
+    daily_values = {}
+    for entry in facets.get("daily", []):
+        key = entry["_id"]
+        if entry["value"] is not None:
+            daily_values[(key["component"], key["metric"], key["date"])] = entry["value"]
+        usage.setdefault(key["component"], {})
+
+    for component, component_usage in usage.items():
+        for stat in ("max", "min", "avg"):
+            if stat in stats:
+                for metric in USAGE_METRICS:
+                    component_usage.setdefault(stat, {}).setdefault(metric, "Not Available")
+        if "daily" in stats:
+            component_usage["daily"] = [
+                {
+                    "date": date,
+                    **{
+                        metric: daily_values.get((component, metric, date), "Not Available")
+                        for metric in USAGE_METRICS
+                    }
+                }
+                for date in dates
+            ]
+
+    return usage
+
+# Function to write a batch of metrics; returns the errors of the documents that failed by index
+def flush_metrics_batch(documents):
+    # Unordered so one bad document doesn't stop the others
+    failed = {}
+    try:
+        metrics_collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            failed[error["index"]] = error.get("errmsg", "Write failed")
+
+    inserted = [document for index, document in enumerate(documents) if index not in failed]
+    if inserted:
+        # The documents are stored, so a rollup failure must not fail their writes
+        try:
+            update_daily_max_for_batch(inserted)
+        except Exception as e:
+            logging.error(f"Error updating max metrics for buffered metrics: {e}")
+    return failed
+
+# Function to update the daily max of the dates a batch completed
+def update_daily_max_for_batch(documents):
+    added = {}
+    for document in documents:
+        date = document.get("date")
+        added[date] = added.get(date, 0) + 1
+
+    # One count for every date in the batch instead of one count_documents per insert
+    counts = metrics_collection.aggregate([
+        {"$match": {"date": {"$in": list(added)}}},
+        {"$group": {"_id": "$date", "count": {"$sum": 1}}}
+    ])
+    # Same rule as the direct path: recalculate when a date reaches its third shift
+    completed_dates = [
+        entry["_id"] for entry in counts
+        if entry["count"] - added[entry["_id"]] < 3 <= entry["count"]
+    ]
+    if not completed_dates:
+        return
+
+    shifts_by_date = {}
+    for shift in metrics_collection.find({"date": {"$in": completed_dates}}):
+        shifts_by_date.setdefault(shift["date"], []).append(shift)
+
+    daily_max_collection.bulk_write([
+        UpdateOne({"date": date}, {"$set": compute_max_metrics(date, shifts)}, upsert=True)
+        for date, shifts in shifts_by_date.items()
+    ])
+    logging.debug(f"Updated max metrics for {completed_dates}")
+
+# A document waiting in the ingest buffer
+class PendingWrite:
+    def __init__(self, data):
+        self.data = data
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+# Group-commit buffer used by /add when INGEST_BUFFERED is enabled
+class IngestBuffer:
+    def __init__(self, flush_interval, max_batch, max_pending):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.pending = []
+        self.condition = threading.Condition()
+        self.thread = None
+
+    # Returns None when the buffer is full
+    def submit(self, data):
+        write = PendingWrite(data)
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                return None
+            # Started lazily so the flusher lives in the serving process
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.pending.append(write)
+            self.condition.notify()
+        return write
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+                # Keep collecting until the interval elapses or the batch is full
+                deadline = time.monotonic() + self.flush_interval
+                while len(self.pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                batch = self.pending[:self.max_batch]
+                self.pending = self.pending[self.max_batch:]
+
+            self.flush(batch)
+
+    def flush(self, batch):
+        try:
+            failed = flush_metrics_batch([write.data for write in batch])
+            for index, message in failed.items():
+                batch[index].error = Exception(message)
+            if failed:
+                logging.error(f"{len(failed)} of {len(batch)} buffered metrics failed to insert")
+        except Exception as e:
+            logging.error(f"Error flushing {len(batch)} buffered metrics: {e}")
+            for write in batch:
+                write.error = e
+        for write in batch:
+            write.done.set()
+
+    def drain(self):
+        # Flush whatever is still buffered when the process exits
+        with self.condition:
+            batch, self.pending = self.pending, []
+        for start in range(0, len(batch), self.max_batch):
+            self.flush(batch[start:start + self.max_batch])
+
+ingest_buffer = IngestBuffer(INGEST_FLUSH_INTERVAL_MS / 1000, INGEST_MAX_BATCH, INGEST_MAX_PENDING) if INGEST_BUFFERED else None
+if ingest_buffer is not None:
+    atexit.register(ingest_buffer.drain)
+
+# Function to filter the daily table for a month
+def get_monthly_data(year, month):
+    daily_table = generate_daily_table()
+
+    monthly_data = {}
+    for component, entries in daily_table.items():
+        monthly_entries = [
+            entry for entry in entries
+            if datetime.strptime(entry["date"], "%d-%m-%Y").month == month and
+               datetime.strptime(entry["date"], "%d-%m-%Y").year == year
+        ]
+        if monthly_entries:
+            monthly_data[component] = monthly_entries
+    return monthly_data
+
+# Function to queue a monthly report; identical in-flight requests share one job
+def submit_monthly_report_job(year, month):
+    # The data is loaded by the job, so coalesced or rejected requests don't scan the collection
+    def render(job):
+        monthly_data = get_monthly_data(year, month)
+        if not monthly_data:
+            raise ReportDataNotFound("No data found for the specified month and year.")
+
+        job.report_progress(0, len(monthly_data))
+        # Charts are only needed while the PDF is being built
+        charts_folder = os.path.join("charts", job.id)
+        try:
+            create_monthly_report_pdf_with_charts_separate_pages(
+                month, year, monthly_data, "./avaxia-logo.png",
+                output_file=job.output_file, charts_folder=charts_folder, progress=job.report_progress
+            )
+        finally:
+            shutil.rmtree(charts_folder, ignore_errors=True)
+
+    return report_pool.submit(("monthly", year, month), f"monthly_report_with_charts_separate_pages_{month}_{year}", render)
+
+# Raised by a report job when there is nothing to render
+class ReportDataNotFound(Exception):
+    pass
+
+# A report rendered in the background
+class ReportJob:
+    def __init__(self, key, report_name):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        # Every job writes its own file, so a new job never touches a finished one
+        self.output_file = os.path.join("monthly_output", f"{report_name}_{self.id}.pdf")
+        self.download_name = f"{report_name}.pdf"
+        self.status = "queued"
+        self.completed = 0
+        self.total = 0
+        self.error = None
+        self.error_code = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def report_progress(self, completed, total):
+        self.completed = completed
+        self.total = total
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": {"completed": self.completed, "total": self.total},
+            "error": self.error,
+            "status_url": f"/reports/{self.id}",
+            "download_url": f"/reports/{self.id}/download",
+        }
+
+# Bounded pool for report rendering; returns no job when the queue is full
+class ReportPool:
+    def __init__(self, workers, queue_limit, job_ttl):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self.queue_limit = queue_limit
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def get(self, job_id):
+        with self.lock:
+            self.prune()
+            return self.jobs.get(job_id)
+
+    def submit(self, key, report_name, render):
+        with self.lock:
+            self.prune()
+
+            # Coalesce with the queued or running job for the same report
+            job = self.in_flight.get(key)
+            if job is not None:
+                return job
+
+            queued = sum(1 for pending in self.in_flight.values() if pending.status == "queued")
+            if queued >= self.queue_limit:
+                return None
+
+            job = ReportJob(key, report_name)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+
+        self.executor.submit(self.run, job, render)
+        return job
+
+    def run(self, job, render):
+        job.status = "running"
+        try:
+            render(job)
+            job.status = "done"
+        except ReportDataNotFound as e:
+            job.error = str(e)
+            job.error_code = 404
+            job.status = "failed"
+        except Exception as e:
+            logging.error(f"Error generating report {job.key}: {e}")
+            job.error = f"Report generation failed: {e}"
+            job.error_code = 500
+            job.status = "failed"
+        finally:
+            with self.lock:
+                self.in_flight.pop(job.key, None)
+                job.finished_at = time.monotonic()
+            job.done.set()
+
+    def prune(self):
+        # Forget finished jobs after REPORT_JOB_TTL seconds and delete their PDFs
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and time.monotonic() - job.finished_at > self.job_ttl
+        ]
+        for job_id in expired:
+            job = self.jobs.pop(job_id)
+            try:
+                os.remove(job.output_file)
+            except FileNotFoundError:
+                pass
+
+report_pool = ReportPool(REPORT_WORKERS, REPORT_QUEUE_LIMIT, REPORT_JOB_TTL)
 
 # Run the app in debug mode
 if __name__ == "__main__":
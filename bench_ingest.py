@@ -0,0 +1,51 @@
+# Benchmark for /add: direct insert_one path vs buffered (group-commit) ingest
+# Usage: python bench_ingest.py [requests] [threads]
+# Writes into a throwaway "ingest_benchmark" database on MONGO_URI
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app as minotor
+
+
+def run(label, total, threads):
+    bench_db = minotor.client.ingest_benchmark
+    bench_db.system_metrics.drop()
+    bench_db.daily_max_metrics.drop()
+    minotor.metrics_collection = bench_db.system_metrics
+    minotor.daily_max_collection = bench_db.daily_max_metrics
+
+    def post(i):
+        document = {
+            "date": f"{i // 3 % 28 + 1:02d}-{i // 84 % 12 + 1:02d}-{2000 + i // 1008}",
+            "shift": i % 3 + 1,
+            "cpu_usage": {"blc-be": i % 7 / 10},
+            "memory_usage": {"blc-be": i % 512},
+            "Application_Availability": {"blc-be": "100%"},
+        }
+        with minotor.app.test_client() as test_client:
+            return test_client.post("/add", json=document).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        statuses = list(executor.map(post, range(total)))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for status in statuses if status >= 300)
+    stored = bench_db.system_metrics.count_documents({})
+    print(f"{label:>10}: {total / elapsed:8.0f} writes/s  ({elapsed:.2f}s, {stored} stored, {errors} errors)")
+    minotor.client.drop_database("ingest_benchmark")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    minotor.ingest_buffer = None
+    run("direct", total, threads)
+
+    minotor.INGEST_ACK_AFTER_FLUSH = True
+    minotor.ingest_buffer = minotor.IngestBuffer(
+        minotor.INGEST_FLUSH_INTERVAL_MS / 1000, minotor.INGEST_MAX_BATCH, minotor.INGEST_MAX_PENDING
+    )
+    run("buffered", total, threads)